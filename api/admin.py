@@ -0,0 +1,351 @@
+"""EduFlow admin CLI.
+
+Replaces the old one-off scripts (check_users.py, debug_users.py,
+transfer_users.py, delete_account.py). Every command streams rows in
+primary-key order and writes in fixed-size batches, so it stays flat in
+memory no matter how many accounts are in eduflow.db.
+
+Usage:
+    python admin.py accounts
+    python admin.py users --orphans
+    python admin.py transfer --to someone@example.com --user-ids 1 2 13 --dry-run
+    python admin.py delete-account a@example.com b@example.com --batch-size 500
+    python admin.py export-history --user-id 7 -o user7.ndjson
+    python admin.py import-history --user-id 9 user7.ndjson --dry-run
+    python admin.py archive --days 180 --vacuum
+"""
+import argparse
+import sys
+from typing import Iterator, List, Optional, Sequence
+
+from sqlalchemy import select, bindparam, text
+from sqlalchemy.orm import Session
+
+from cache import forget_accounts, forget_students
+from database import SessionLocal, DEFAULT_BATCH_SIZE, MAX_IN_PARAMS
+from models import Account, User
+import history
+import retention
+import stats
+
+# Parameterized bulk statements: `expanding` bind params render one
+# placeholder per id, so nothing is ever formatted into the SQL string.
+DELETE_ENTRIES_SQL = text("DELETE FROM calendar_entries WHERE user_id IN :uids").bindparams(bindparam("uids", expanding=True))
+DELETE_GOALS_SQL = text("DELETE FROM goals WHERE user_id IN :uids").bindparams(bindparam("uids", expanding=True))
+DELETE_USERS_SQL = text("DELETE FROM users WHERE id IN :uids").bindparams(bindparam("uids", expanding=True))
+DELETE_ACCOUNTS_SQL = text("DELETE FROM accounts WHERE id IN :aids").bindparams(bindparam("aids", expanding=True))
+COUNT_ENTRIES_SQL = text("SELECT COUNT(*) FROM calendar_entries WHERE user_id IN :uids").bindparams(bindparam("uids", expanding=True))
+COUNT_GOALS_SQL = text("SELECT COUNT(*) FROM goals WHERE user_id IN :uids").bindparams(bindparam("uids", expanding=True))
+TRANSFER_USERS_SQL = text("UPDATE users SET account_id = :aid WHERE id IN :uids").bindparams(bindparam("uids", expanding=True))
+
+
+# Streaming helpers
+def iter_rows(db: Session, stmt, id_column, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+    """Yield rows of `stmt` one at a time using keyset pagination on `id_column`.
+
+    Only one page of `batch_size` rows is held in memory at a time, and each
+    page is an index range scan, so this does not slow down on large tables
+    the way OFFSET paging does.
+    """
+    last_id = 0
+    while True:
+        page = db.execute(
+            stmt.where(id_column > last_id).order_by(id_column).limit(batch_size)
+        ).all()
+        if not page:
+            return
+        for row in page:
+            yield row
+        last_id = page[-1].id
+
+
+def chunked(items: Sequence, size: int) -> Iterator[List]:
+    for i in range(0, len(items), size):
+        yield list(items[i:i + size])
+
+
+def progress(label: str, done: int, total: int):
+    pct = (done * 100 // total) if total else 100
+    print(f"   ... {label}: {done}/{total} ({pct}%)", flush=True)
+
+
+# Commands
+def cmd_accounts(db: Session, args) -> int:
+    count = 0
+    print("=== 注册账号 ===")
+    stmt = select(Account.id, Account.username)
+    for acc in iter_rows(db, stmt, Account.id, args.batch_size):
+        print(f"ID: {acc.id} | Email: {acc.username}")
+        count += 1
+    print(f"Total: {count}")
+    return 0
+
+
+def cmd_users(db: Session, args) -> int:
+    count = 0
+    stmt = select(User.id, User.name, User.grade, User.account_id, User.subjects)
+    if args.orphans:
+        stmt = stmt.where(User.account_id.is_(None))
+    elif args.account:
+        account_id = db.execute(select(Account.id).where(Account.username == args.account)).scalar()
+        if account_id is None:
+            print(f"❌ 错误：找不到账号 {args.account}！", file=sys.stderr)
+            return 1
+        stmt = stmt.where(User.account_id == account_id)
+
+    print("=== 家庭成员 ===")
+    for u in iter_rows(db, stmt, User.id, args.batch_size):
+        owner = f"Account ID: {u.account_id}" if u.account_id is not None else "⚠️ 孤儿数据 (account_id=NULL)"
+        print(f"ID: {u.id} | Name: {u.name} | Grade: {u.grade} | {owner}")
+        print(f"   Subjects: {u.subjects}")
+        count += 1
+    print(f"Total: {count}")
+    return 0
+
+
+def cmd_transfer(db: Session, args) -> int:
+    target_id = db.execute(select(Account.id).where(Account.username == args.to)).scalar()
+    if target_id is None:
+        print(f"❌ 错误：找不到账号 {args.to}！请先注册或检查拼写。", file=sys.stderr)
+        return 1
+
+    if args.user_ids:
+        # Keep only ids that exist, checked a batch at a time
+        user_ids = []
+        for chunk in chunked(sorted(set(args.user_ids)), MAX_IN_PARAMS):
+            found = db.execute(select(User.id).where(User.id.in_(chunk))).scalars().all()
+            for missing in sorted(set(chunk) - set(found)):
+                print(f"   ⚠️ 成员 ID {missing} 不存在，跳过。")
+            user_ids.extend(found)
+    else:
+        stmt = select(User.id)
+        if args.orphans:
+            stmt = stmt.where(User.account_id.is_(None))
+        else:
+            source_id = db.execute(select(Account.id).where(Account.username == args.from_account)).scalar()
+            if source_id is None:
+                print(f"❌ 错误：找不到账号 {args.from_account}！", file=sys.stderr)
+                return 1
+            stmt = stmt.where(User.account_id == source_id)
+        user_ids = [row.id for row in iter_rows(db, stmt, User.id, args.batch_size)]
+
+    total = len(user_ids)
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"🔄 {prefix}过户 {total} 名成员到 {args.to} (ID {target_id})")
+
+    done = 0
+    for chunk in chunked(user_ids, min(args.batch_size, MAX_IN_PARAMS)):
+        if not args.dry_run:
+            db.execute(TRANSFER_USERS_SQL, {"aid": target_id, "uids": chunk})
+            db.commit()
+        done += len(chunk)
+        progress("users", done, total)
+
+    print(f"🎉 {prefix}完成！共过户 {done} 名成员。")
+    return 0
+
+
+def delete_accounts(db: Session, account_ids: List[int], dry_run: bool, deleted_users: Optional[List[int]] = None) -> dict:
+    """Delete a batch of accounts and everything hanging off them in one transaction.
+
+    Ids of the deleted students are appended to `deleted_users`; their
+    archived entries are left for the caller to purge once for all batches
+    (see purge_archive), since each purge rewrites every affected partition.
+    """
+    user_ids = db.execute(select(User.id).where(User.account_id.in_(account_ids))).scalars().all()
+    counts = {"accounts": len(account_ids), "users": len(user_ids), "calendar_entries": 0, "goals": 0}
+    if dry_run:
+        for uids in chunked(user_ids, MAX_IN_PARAMS):
+            counts["calendar_entries"] += db.execute(COUNT_ENTRIES_SQL, {"uids": uids}).scalar()
+            counts["goals"] += db.execute(COUNT_GOALS_SQL, {"uids": uids}).scalar()
+        return counts
+
+    try:
+        for uids in chunked(user_ids, MAX_IN_PARAMS):
+            counts["calendar_entries"] += db.execute(DELETE_ENTRIES_SQL, {"uids": uids}).rowcount
+            counts["goals"] += db.execute(DELETE_GOALS_SQL, {"uids": uids}).rowcount
+            db.execute(DELETE_USERS_SQL, {"uids": uids})
+        db.execute(DELETE_ACCOUNTS_SQL, {"aids": account_ids})
+        # Keep the running totals in step with the rows actually left
+        stats.incr(db, "signups", -counts["accounts"], day=stats.TOTAL_DAY)
+        stats.incr(db, "students", -counts["users"], day=stats.TOTAL_DAY)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    forget_accounts(account_ids)
+    forget_students(user_ids)
+    if deleted_users is not None:
+        deleted_users.extend(user_ids)
+    return counts
+
+
+def purge_archive(user_ids: List[int]) -> bool:
+    """Remove deleted students from the archive. Reports failures instead of raising."""
+    if not user_ids:
+        return True
+    print(f"🗄️ 清除 {len(user_ids)} 名成员的归档数据...")
+    try:
+        retention.forget_users(user_ids)
+    except Exception as e:
+        print(f"❌ 归档清除失败: {e}（数据库中的删除已提交；这些成员 ID 会被复用，请修复归档后清除）", file=sys.stderr)
+        print("   未清除的成员 ID: " + " ".join(map(str, user_ids)), file=sys.stderr)
+        return False
+    return True
+
+
+def cmd_delete_account(db: Session, args) -> int:
+    usernames = list(args.usernames)
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            usernames.extend(line.strip() for line in f if line.strip())
+    usernames = list(dict.fromkeys(usernames)) # Repeated names would count as missing
+    if not usernames:
+        print("❌ 错误：请指定要删除的账号。", file=sys.stderr)
+        return 1
+
+    prefix = "[dry-run] " if args.dry_run else ""
+    total = len(usernames)
+    print(f"🗑️ {prefix}准备删除 {total} 个账号及其所有关联数据...")
+
+    totals = {"accounts": 0, "users": 0, "calendar_entries": 0, "goals": 0}
+    deleted_users = []
+    done = 0
+    try:
+        for names in chunked(usernames, min(args.batch_size, MAX_IN_PARAMS)):
+            account_ids = db.execute(select(Account.id).where(Account.username.in_(names))).scalars().all()
+            if account_ids:
+                for key, value in delete_accounts(db, account_ids, args.dry_run, deleted_users).items():
+                    totals[key] += value
+            done += len(names)
+            progress("accounts", done, total)
+    finally:
+        # Once for every committed batch, including when a later batch failed
+        archive_ok = purge_archive(deleted_users)
+
+    missing = total - totals["accounts"]
+    if missing:
+        print(f"   ⚠️ {missing} 个账号不存在，已跳过。")
+    print("-" * 50)
+    print(
+        f"🎉 {prefix}删除账号 {totals['accounts']} 个，家庭成员 {totals['users']} 人，"
+        f"学习卡片 {totals['calendar_entries']} 条，学习目标 {totals['goals']} 条。"
+    )
+    return 0 if archive_ok else 1
+
+
+def cmd_export_history(db: Session, args) -> int:
+    user = db.get(User, args.user_id)
+    if user is None:
+        print(f"❌ 错误：成员 ID {args.user_id} 不存在！", file=sys.stderr)
+        return 1
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        lines = 0
+        for line in history.export_history(db, user):
+            out.write(line)
+            lines += 1
+    finally:
+        if args.output:
+            out.close()
+    print(f"✅ 已导出 {lines} 行 ({user.name})", file=sys.stderr)
+    return 0
+
+
+def cmd_import_history(db: Session, args) -> int:
+    if db.get(User, args.user_id) is None:
+        print(f"❌ 错误：成员 ID {args.user_id} 不存在！", file=sys.stderr)
+        return 1
+    prefix = "[dry-run] " if args.dry_run else ""
+    f = open(args.input, "r", encoding="utf-8") if args.input != "-" else sys.stdin
+    try:
+        totals = history.import_history(
+            db, args.user_id, f, batch_size=min(args.batch_size, MAX_IN_PARAMS), dry_run=args.dry_run,
+            on_batch=lambda t: print(f"   ... 新增 {t['inserted']} / 更新 {t['updated']}", flush=True),
+        )
+    except history.HistoryImportError as e:
+        print(f"❌ 导入中止: {e}（之前的批次已提交，可修正后重新导入）", file=sys.stderr)
+        return 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    print(f"🎉 {prefix}导入完成：新增 {totals['inserted']} 条，更新 {totals['updated']} 条，已归档跳过 {totals['archived']} 条。")
+    return 0
+
+
+def cmd_archive(db: Session, args) -> int:
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"🗄️ {prefix}归档 {retention.cutoff_date(args.days)} 之前的学习卡片到 {retention.ARCHIVE_DIR} ...")
+    totals = retention.archive_entries(
+        db, days=args.days, batch_size=args.batch_size, dry_run=args.dry_run,
+        on_batch=lambda month, t: print(f"   ... {month}: 累计 {t['entries']} 条", flush=True),
+    )
+    print(f"🎉 {prefix}完成：{totals['months']} 个月份，共 {totals['entries']} 条。")
+    if not args.dry_run:
+        print("🔧 ANALYZE" + (" + VACUUM" if args.vacuum else "") + " ...")
+        retention.maintain(db, vacuum=args.vacuum)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per read page / write transaction")
+    common.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+
+    parser = argparse.ArgumentParser(prog="admin.py", description="EduFlow 运维工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("accounts", parents=[common], help="list registered accounts")
+    p.set_defaults(func=cmd_accounts)
+
+    p = sub.add_parser("users", parents=[common], help="list family members")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--account", help="only members of this account (username)")
+    group.add_argument("--orphans", action="store_true", help="only members with no account")
+    p.set_defaults(func=cmd_users)
+
+    p = sub.add_parser("transfer", parents=[common], help="move family members to another account")
+    p.add_argument("--to", required=True, help="target account username")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--user-ids", type=int, nargs="+", help="member ids to move")
+    group.add_argument("--from-account", help="move every member of this account")
+    group.add_argument("--orphans", action="store_true", help="move every member with no account")
+    p.set_defaults(func=cmd_transfer)
+
+    p = sub.add_parser("delete-account", parents=[common], help="delete accounts and all their data")
+    p.add_argument("usernames", nargs="*", help="account usernames to delete")
+    p.add_argument("--file", help="file with one username per line")
+    p.set_defaults(func=cmd_delete_account)
+
+    p = sub.add_parser("export-history", parents=[common], help="export a member's goals and cards as NDJSON")
+    p.add_argument("--user-id", type=int, required=True)
+    p.add_argument("-o", "--output", help="output file (default: stdout)")
+    p.set_defaults(func=cmd_export_history)
+
+    p = sub.add_parser("import-history", parents=[common], help="import an NDJSON history into a member")
+    p.add_argument("--user-id", type=int, required=True)
+    p.add_argument("input", help="NDJSON file, or - for stdin")
+    p.set_defaults(func=cmd_import_history)
+
+    p = sub.add_parser("archive", parents=[common], help="move old calendar entries to the monthly archive")
+    p.add_argument("--days", type=int, default=retention.RETENTION_DAYS, help="keep this many days live")
+    p.add_argument("--vacuum", action="store_true", help="also VACUUM afterwards (locks the database)")
+    p.set_defaults(func=cmd_archive)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.batch_size <= 0:
+        print("❌ 错误：--batch-size 必须大于 0。", file=sys.stderr)
+        return 2
+    db = SessionLocal()
+    try:
+        return args.func(db, args)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Cold-start benchmark for the API worker.
+
+Each run starts a fresh interpreter (like a restarted or newly scaled
+worker) and measures:
+    import   time to `import main`
+    ready    time until the lifespan startup has finished
+    first    time until the first request has been served
+
+Usage:
+    python bench_startup.py              # 5 runs against a scratch database
+    python bench_startup.py --runs 10 --warmup
+    python bench_startup.py --importtime # slowest modules from -X importtime
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t2 = time.perf_counter()
+    client.post("/api/token", data={"username": "bench", "password": "bench"})
+    t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "ready": t2 - t0, "first": t3 - t0}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def print_importtime(env: dict, top: int):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_startup.py")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="set EDUFLOW_WARMUP=1 (eager service init at startup)")
+    parser.add_argument("--importtime", action="store_true", help="show the slowest imports instead")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        if args.warmup:
+            env["EDUFLOW_WARMUP"] = "1"
+
+        if args.importtime:
+            print_importtime(env, args.top)
+            return
+
+        results = [run_once(env) for _ in range(args.runs)]
+        print(f"{'phase':<8}{'median':>10}{'min':>10}{'max':>10}   ({args.runs} runs)")
+        for phase in ("import", "ready", "first"):
+            values = [r[phase] * 1000 for r in results]
+            print(f"{phase:<8}{statistics.median(values):>8.1f}ms{min(values):>8.1f}ms{max(values):>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
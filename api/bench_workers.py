@@ -0,0 +1,87 @@
+"""Compare the memory and shared SQLite cache backends with 1 vs N workers.
+
+Simulates the explanation endpoint: every request picks a concept from a
+fixed pool (Zipf-like skew) and, on a cache miss, counts as one LLM call
+subject to a global per-minute limit. Requests are split evenly across
+worker processes, as uvicorn would with `--workers N`.
+
+Reports per backend / worker count:
+    hit%     cache hit rate over all requests
+    llm      LLM calls allowed by the rate limiter (should be <= --limit)
+    ops/s    cache requests served per second across all workers
+
+Usage:
+    python bench_workers.py --workers 4 --requests 20000 --limit 500
+"""
+import argparse
+import multiprocessing as mp
+import os
+import random
+import tempfile
+import time
+
+
+def worker(backend: str, path: str, n_requests: int, n_keys: int, limit: int, seed: int, out):
+    os.environ["EDUFLOW_CACHE"] = backend
+    os.environ["EDUFLOW_CACHE_PATH"] = path
+    from cache import get_cache, rate_limited
+
+    cache = get_cache()
+    rng = random.Random(seed)
+    weights = [1 / (i + 1) for i in range(n_keys)]
+    keys = rng.choices(range(n_keys), weights=weights, k=n_requests)
+
+    hits = llm_calls = 0
+    start = time.perf_counter()
+    for k in keys:
+        key = f"explain:{k}"
+        if cache.get(key) is not None:
+            hits += 1
+            continue
+        if rate_limited("llm", limit):
+            continue
+        llm_calls += 1
+        cache.set(key, f"explanation {k}", ttl=3600)
+    out.put((hits, llm_calls, time.perf_counter() - start))
+
+
+def run(backend: str, workers: int, n_requests: int, n_keys: int, limit: int) -> dict:
+    ctx = mp.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        out = ctx.Queue()
+        per_worker = n_requests // workers
+        procs = [
+            ctx.Process(target=worker, args=(backend, path, per_worker, n_keys, limit, i, out))
+            for i in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    hits = sum(r[0] for r in results)
+    llm_calls = sum(r[1] for r in results)
+    elapsed = max(r[2] for r in results)
+    total = per_worker * workers
+    return {"hit": hits / total, "llm": llm_calls, "ops": total / elapsed if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_workers.py")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--keys", type=int, default=2000, help="distinct concepts")
+    parser.add_argument("--limit", type=int, default=500, help="LLM calls per minute")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8}{'workers':>8}{'hit%':>8}{'llm':>8}{'ops/s':>12}   (limit {args.limit}/min)")
+    for backend in ("memory", "sqlite"):
+        for workers in sorted({1, args.workers}):
+            r = run(backend, workers, args.requests, args.keys, args.limit)
+            print(f"{backend:<8}{workers:>8}{r['hit'] * 100:>7.1f}%{r['llm']:>8}{r['ops']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Key-value cache with TTL shared by the API handlers.
+
+Two backends with the same interface:
+    memory   per-process dict (default, fine for a single uvicorn worker)
+    sqlite   a WAL-mode SQLite file that every worker process on the host
+             opens, so hit rates and rate limits are global when running
+             `uvicorn main:app --workers N`
+
+Select with EDUFLOW_CACHE=memory|sqlite (EDUFLOW_CACHE_PATH sets the file,
+default ./eduflow_cache.db). Values must be JSON-serializable.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+DEFAULT_TTL = 300
+# Fraction of writes that also purge expired rows
+PURGE_PROBABILITY = 0.01
+
+
+class MemoryCache:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[1] <= now:
+            del self._data[key]
+            return None
+        return item
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._live(key, time.time())
+            return item[0] if item else None
+
+    def set(self, key: str, value: Any, ttl: float = DEFAULT_TTL):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+
+    def add(self, key: str, value: Any, ttl: float = DEFAULT_TTL) -> bool:
+        """Set `key` only if it is absent or expired. Returns True if it was set."""
+        now = time.time()
+        with self._lock:
+            if self._live(key, now):
+                return False
+            self._data[key] = (value, now + ttl)
+            return True
+
+    def incr(self, key: str, amount: int = 1, ttl: float = DEFAULT_TTL) -> int:
+        """Atomically add `amount`; a missing or expired key starts at 0 with a fresh TTL."""
+        now = time.time()
+        with self._lock:
+            item = self._live(key, now)
+            value, expires_at = (item[0] + amount, item[1]) if item else (amount, now + ttl)
+            self._data[key] = (value, expires_at)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # One autocommit connection per thread; each statement is its own atomic transaction
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection, now: float):
+        if random.random() < PURGE_PROBABILITY:
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        value = row[0]
+        return json.loads(value) if isinstance(value, str) else value
+
+    def set(self, key: str, value: Any, ttl: float = DEFAULT_TTL):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False), now + ttl),
+        )
+        self._maybe_purge(conn, now)
+
+    def add(self, key: str, value: Any, ttl: float = DEFAULT_TTL) -> bool:
+        now = time.time()
+        cur = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at <= ?",
+            (key, json.dumps(value, ensure_ascii=False), now + ttl, now),
+        )
+        return cur.rowcount == 1
+
+    def incr(self, key: str, amount: int = 1, ttl: float = DEFAULT_TTL) -> int:
+        now = time.time()
+        row = self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN kv.expires_at <= ? THEN excluded.value ELSE kv.value + excluded.value END, "
+            "expires_at = CASE WHEN kv.expires_at <= ? THEN excluded.expires_at ELSE kv.expires_at END "
+            "RETURNING value",
+            (key, amount, now + ttl, now, now),
+        ).fetchone()
+        return int(row[0])
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM kv")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache instance, created on first use from the environment."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if os.getenv("EDUFLOW_CACHE", "memory") == "sqlite":
+                    _cache = SQLiteCache(os.getenv("EDUFLOW_CACHE_PATH", "./eduflow_cache.db"))
+                else:
+                    _cache = MemoryCache()
+    return _cache
+
+
+def rate_limited(name: str, limit: int, window: int = 60) -> bool:
+    """Fixed-window limiter: True once more than `limit` calls hit `name` in the current window."""
+    if limit <= 0:
+        return False
+    bucket = int(time.time() // window)
+    return get_cache().incr(f"rate:{name}:{bucket}", 1, ttl=window * 2) > limit
+
+
+def _track(index_key: str, key: str, ttl: float):
+    """List `key` under `index_key` until it expires, so _forget() can drop it later."""
+    cache = get_cache()
+    now = time.time()
+    # Not atomic; a key lost to a concurrent write is still rejected by the owner check on read
+    keys = {k: exp for k, exp in (cache.get(index_key) or []) if exp > now}
+    keys[key] = now + ttl
+    cache.set(index_key, sorted(keys.items()), ttl=max(keys.values()) - now)
+
+
+def _forget(index_key: str):
+    cache = get_cache()
+    for key, _ in cache.get(index_key) or []:
+        cache.delete(key)
+    cache.delete(index_key)
+
+
+def remember_auth(key: str, account_id: int, username: str, ttl: float):
+    """Cache a verified token and list it under its account so forget_accounts() can drop it."""
+    get_cache().set(key, [account_id, username], ttl=ttl)
+    _track(f"auth-keys:{account_id}", key, ttl)
+
+
+def remember_cards(key: str, user_id: int, value, ttl: float):
+    """Cache a day's cards and list them under the student so forget_students() can drop them."""
+    get_cache().set(key, value, ttl=ttl)
+    _track(f"card-keys:{user_id}", key, ttl)
+
+
+def forget_accounts(account_ids):
+    """Drop every cached token of the given (deleted) accounts."""
+    for account_id in account_ids:
+        _forget(f"auth-keys:{account_id}")
+
+
+def forget_students(user_ids):
+    """Drop every cached card list of the given (deleted) students; their ids will be reused."""
+    for user_id in user_ids:
+        _forget(f"card-keys:{user_id}")
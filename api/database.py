@@ -0,0 +1,24 @@
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, declarative_base
+
+load_dotenv()
+
+# Database Setup (shared by main.py and the admin tools)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./eduflow.db")
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base = declarative_base()
+
+# Bulk reads/writes in admin.py, history.py and retention.py
+DEFAULT_BATCH_SIZE = 500
+# Older SQLite builds cap a statement at 999 bound variables
+MAX_IN_PARAMS = 900
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
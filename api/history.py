@@ -0,0 +1,224 @@
+"""Streaming NDJSON export / import of a student's learning history.
+
+One JSON object per line:
+    {"type": "user", "version": 1, "name": ..., "phase": ..., "grade": ..., "subjects": [...]}
+    {"type": "goal", "description": ..., "target_date": ..., "is_active": true}
+    {"type": "calendar_entry", "date": "YYYY-MM-DD", "subject": ..., "content": ...}
+
+Export reads through a streaming cursor, so memory stays constant however
+long the history is, and includes entries already moved to the archive
+(see retention.py). Import applies records in batches, one transaction
+per batch, and is idempotent: a calendar entry is matched on
+(date, subject) and a goal on (description, target_date), so replaying
+the same file updates rows instead of duplicating them. Entries that are
+already archived are left there untouched and counted as "archived".
+"""
+import codecs
+import json
+import re
+from typing import AsyncIterator, Iterable, Iterator, List
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.orm import Session
+
+from cache import get_cache
+from database import DEFAULT_BATCH_SIZE
+from models import User, Goal, CalendarEntry
+import retention
+
+FORMAT_VERSION = 1
+STREAM_CHUNK = 500
+DATE_RE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+
+
+class HistoryImportError(ValueError):
+    pass
+
+
+def _line(obj: dict) -> str:
+    return json.dumps(obj, ensure_ascii=False) + "\n"
+
+
+def export_history(db: Session, user: User, include_archived: bool = True) -> Iterator[str]:
+    yield _line({
+        "type": "user",
+        "version": FORMAT_VERSION,
+        "name": user.name,
+        "phase": user.phase,
+        "grade": user.grade,
+        "subjects": user.subjects.split(",") if user.subjects else [],
+    })
+
+    goals = db.execute(
+        select(Goal.description, Goal.target_date, Goal.is_active)
+        .where(Goal.user_id == user.id).order_by(Goal.id)
+        .execution_options(stream_results=True, yield_per=STREAM_CHUNK)
+    )
+    for g in goals:
+        yield _line({"type": "goal", "description": g.description, "target_date": g.target_date, "is_active": bool(g.is_active)})
+
+    # Entries moved out by retention.py come first; they are all older than the live ones
+    if include_archived:
+        for e in retention.read_archived(user.id):
+            yield _line({"type": "calendar_entry", "date": e["date"], "subject": e["subject"], "content": e["content"]})
+
+    entries = db.execute(
+        select(CalendarEntry.date, CalendarEntry.subject, CalendarEntry.content)
+        .where(CalendarEntry.user_id == user.id).order_by(CalendarEntry.id)
+        .execution_options(stream_results=True, yield_per=STREAM_CHUNK)
+    )
+    for e in entries:
+        yield _line({"type": "calendar_entry", "date": str(e.date), "subject": e.subject, "content": e.content})
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a streamed request body into lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+def _check_str(record: dict, fields, line_no: int):
+    for field in fields:
+        value = record.get(field)
+        if not isinstance(value, str) or not value:
+            raise HistoryImportError(f"line {line_no}: {record['type']}.{field} must be a non-empty string")
+
+
+def parse_line(line: str, line_no: int):
+    """Returns the validated record dict, or None for blank lines and the header."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise HistoryImportError(f"line {line_no}: invalid JSON ({e})")
+    kind = record.get("type") if isinstance(record, dict) else None
+    if kind == "user":
+        version = record.get("version", FORMAT_VERSION)
+        if not isinstance(version, int) or isinstance(version, bool):
+            raise HistoryImportError(f"line {line_no}: version must be an integer")
+        if version > FORMAT_VERSION:
+            raise HistoryImportError(f"line {line_no}: unsupported export version {version}")
+        return None
+    if kind == "calendar_entry":
+        _check_str(record, ("date", "subject"), line_no)
+        if not isinstance(record.get("content"), str):
+            raise HistoryImportError(f"line {line_no}: calendar_entry.content must be a string")
+        # Stored dates are compared as text (str(row.date), retention's month prefix)
+        if not DATE_RE.fullmatch(record["date"]):
+            raise HistoryImportError(f"line {line_no}: calendar_entry.date must be YYYY-MM-DD")
+        return record
+    if kind == "goal":
+        _check_str(record, ("description", "target_date"), line_no)
+        if not isinstance(record.get("is_active", True), bool):
+            raise HistoryImportError(f"line {line_no}: goal.is_active must be true or false")
+        return record
+    raise HistoryImportError(f"line {line_no}: unknown record type {kind!r}")
+
+
+def apply_batch(db: Session, user_id: int, records: List[dict], dry_run: bool = False) -> dict:
+    """Upsert one batch of parsed records in a single transaction."""
+    counts = {"inserted": 0, "updated": 0, "archived": 0}
+    entries = {}
+    goals = {}
+    # Later lines win within a batch, same as across batches
+    for r in records:
+        if r["type"] == "calendar_entry":
+            entries[(r["date"], r["subject"])] = r["content"]
+        else:
+            goals[(r["description"], r["target_date"])] = bool(r.get("is_active", True))
+
+    # Entries already moved to the archive are kept as archived, not revived as live rows
+    archived = retention.archived_keys(user_id, {d[:7] for d, _ in entries}) if entries else set()
+    counts["archived"] = sum(1 for k in entries if k in archived)
+    entries = {k: c for k, c in entries.items() if k not in archived}
+
+    try:
+        if entries:
+            dates = sorted({d for d, _ in entries})
+            existing = {
+                (str(row.date), row.subject): row.id
+                for row in db.execute(
+                    select(CalendarEntry.id, CalendarEntry.date, CalendarEntry.subject)
+                    .where(CalendarEntry.user_id == user_id, CalendarEntry.date.in_(dates))
+                )
+            }
+            updates = [{"id": existing[k], "content": c} for k, c in entries.items() if k in existing]
+            inserts = [
+                {"user_id": user_id, "date": d, "subject": s, "content": c}
+                for (d, s), c in entries.items() if (d, s) not in existing
+            ]
+            if updates:
+                db.execute(update(CalendarEntry), updates)
+            if inserts:
+                db.execute(insert(CalendarEntry), inserts)
+            counts["updated"] += len(updates)
+            counts["inserted"] += len(inserts)
+
+        if goals:
+            descriptions = sorted({d for d, _ in goals})
+            existing = {
+                (row.description, row.target_date): row.id
+                for row in db.execute(
+                    select(Goal.id, Goal.description, Goal.target_date)
+                    .where(Goal.user_id == user_id, Goal.description.in_(descriptions))
+                )
+            }
+            updates = [{"id": existing[k], "is_active": a} for k, a in goals.items() if k in existing]
+            inserts = [
+                {"user_id": user_id, "description": d, "target_date": t, "is_active": a}
+                for (d, t), a in goals.items() if (d, t) not in existing
+            ]
+            if updates:
+                db.execute(update(Goal), updates)
+            if inserts:
+                db.execute(insert(Goal), inserts)
+            counts["updated"] += len(updates)
+            counts["inserted"] += len(inserts)
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if not dry_run:
+        for d in {d for d, _ in entries}:
+            get_cache().delete(f"cards:{user_id}:{d}")
+    return counts
+
+
+def import_history(db: Session, user_id: int, lines: Iterable[str], batch_size: int = DEFAULT_BATCH_SIZE,
+                   dry_run: bool = False, on_batch=None) -> dict:
+    """Apply an NDJSON stream batch by batch. `on_batch(totals)` is called after each batch."""
+    totals = {"inserted": 0, "updated": 0, "archived": 0}
+    batch = []
+
+    def flush():
+        for key, value in apply_batch(db, user_id, batch, dry_run).items():
+            totals[key] += value
+        batch.clear()
+        if on_batch:
+            on_batch(totals)
+
+    for line_no, line in enumerate(lines, 1):
+        record = parse_line(line, line_no)
+        if record is None:
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return totals
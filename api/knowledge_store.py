@@ -0,0 +1,251 @@
+"""Fallback knowledge base storage.
+
+`data/knowledge_base.json` is the editable source. For large corpora,
+compile it once into `data/knowledge_base.bin`:
+
+    python knowledge_store.py build [--json PATH] [--out PATH]
+
+The binary file is memory-mapped read-only, so every worker process shares
+the same pages through the OS page cache instead of holding its own copy
+of the corpus as Python objects. Only the small group directory is parsed
+at open; cards are decoded one at a time when sampled.
+
+Layout (little-endian):
+    header     b"EDKB" | version u32 | group count u32
+    directory  per group: name length u16 | name utf-8 ("<level>/<subject>")
+               | card count u32 | offset of the group's card table u64
+    per group  card table: count x (content offset u64 | content length u32
+               | topic start u32 | topic length u32)
+    records    content utf-8, back to back
+
+Topics are extracted at build time with `extract_topic`; since a topic is
+always a substring of its card, it is stored as a byte range inside the
+content, so duplicate filtering never runs the regexes over the corpus.
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import re
+import struct
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+MAGIC = b"EDKB"
+VERSION = 1
+HEADER = struct.Struct("<4sII")
+GROUP = struct.Struct("<IQ")
+CARD = struct.Struct("<QIII")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+JSON_PATH = os.path.join(DATA_DIR, "knowledge_base.json")
+BIN_PATH = os.path.join(DATA_DIR, "knowledge_base.bin")
+
+# Groups up to this size are filtered exactly; larger ones are sampled
+EXACT_FILTER_LIMIT = 256
+SAMPLE_ATTEMPTS = 32
+
+
+def extract_topic(content: str) -> str:
+    # Handle prefixes like "知识点：", "Topic:", etc.
+    # First, try to remove these patterns from the start
+    clean_content = re.sub(r'^(Topic|Concept|主题|概念|知识点|Title|标题)[:：\-\s]+', '', content, flags=re.I)
+
+    # Then split by either Chinese '：' or standard ':' to get the header
+    parts = re.split(r'[:：]', clean_content, maxsplit=1)
+    topic = parts[0].strip() if parts else clean_content.strip()
+    return topic
+
+def is_duplicate(new_topic: str, excluded_topics: List[str]) -> bool:
+    if not excluded_topics:
+        return False
+    new_t = new_topic.lower()
+    for ex in excluded_topics:
+        ex_t = ex.lower()
+        # Exact match or substring match (e.g. "勾股定理" matches "勾股定理的应用")
+        if ex_t in new_t or new_t in ex_t:
+            return True
+    return False
+
+
+class KnowledgeStore(ABC):
+    """Common sampling logic; subclasses provide count/topic/content by index."""
+
+    @abstractmethod
+    def count(self, level: str, subject: str) -> int: ...
+
+    @abstractmethod
+    def topic(self, level: str, subject: str, i: int) -> str: ...
+
+    @abstractmethod
+    def content(self, level: str, subject: str, i: int) -> str: ...
+
+    def sample(self, level: str, subject: str, exclude_topics: Optional[List[str]] = None) -> Optional[str]:
+        """Random card from the group, avoiding excluded topics when possible."""
+        n = self.count(level, subject)
+        if not n:
+            return None
+        if not exclude_topics:
+            return self.content(level, subject, random.randrange(n))
+
+        if n <= EXACT_FILTER_LIMIT:
+            allowed = [i for i in range(n) if not is_duplicate(self.topic(level, subject, i), exclude_topics)]
+            return self.content(level, subject, random.choice(allowed) if allowed else random.randrange(n))
+
+        # Large group: exclusions cover at most a few dozen topics, so random probes hit quickly
+        first = random.randrange(n)
+        i = first
+        for _ in range(SAMPLE_ATTEMPTS):
+            if not is_duplicate(self.topic(level, subject, i), exclude_topics):
+                return self.content(level, subject, i)
+            i = random.randrange(n)
+        return self.content(level, subject, first)
+
+
+class JsonKnowledgeStore(KnowledgeStore):
+    def __init__(self, data: dict):
+        self.data = data
+        self._topics = {}
+
+    @classmethod
+    def load(cls, path: str = JSON_PATH) -> "JsonKnowledgeStore":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _cards(self, level: str, subject: str) -> list:
+        return self.data.get(level, {}).get(subject) or []
+
+    def count(self, level, subject):
+        return len(self._cards(level, subject))
+
+    def topic(self, level, subject, i):
+        topics = self._topics.get((level, subject))
+        if topics is None:
+            topics = self._topics[(level, subject)] = [extract_topic(c) for c in self._cards(level, subject)]
+        return topics[i]
+
+    def content(self, level, subject, i):
+        return self._cards(level, subject)[i]
+
+
+class CompactKnowledgeStore(KnowledgeStore):
+    def __init__(self, path: str = BIN_PATH):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._groups = self._read_directory(path)
+        except Exception:
+            self._mm.close()
+            raise
+
+    def _read_directory(self, path: str) -> dict:
+        size = len(self._mm)
+        try:
+            magic, version, n_groups = HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} knowledge base")
+
+            groups = {}
+            pos = HEADER.size
+            for _ in range(n_groups):
+                (name_len,) = struct.unpack_from("<H", self._mm, pos)
+                pos += 2
+                level, subject = bytes(self._mm[pos:pos + name_len]).decode("utf-8").split("/", 1)
+                pos += name_len
+                count, table = GROUP.unpack_from(self._mm, pos)
+                pos += GROUP.size
+                # Bounds-check the table and its last record so a truncated file fails here, not mid-request
+                if table + count * CARD.size > size:
+                    raise ValueError(f"{path}: card table of {level}/{subject} runs past end of file")
+                if count:
+                    offset, content_len, _, _ = CARD.unpack_from(self._mm, table + (count - 1) * CARD.size)
+                    if offset + content_len > size:
+                        raise ValueError(f"{path}: records of {level}/{subject} run past end of file")
+                groups[(level, subject)] = (count, table)
+            return groups
+        except struct.error as e:
+            raise ValueError(f"{path} is truncated or corrupt ({e})")
+
+    def _card(self, level, subject, i):
+        count, table = self._groups[(level, subject)]
+        if not 0 <= i < count:
+            raise IndexError(i)
+        return CARD.unpack_from(self._mm, table + i * CARD.size)
+
+    def count(self, level, subject):
+        return self._groups.get((level, subject), (0, 0))[0]
+
+    def topic(self, level, subject, i):
+        offset, _, topic_start, topic_len = self._card(level, subject, i)
+        start = offset + topic_start
+        return self._mm[start:start + topic_len].decode("utf-8")
+
+    def content(self, level, subject, i):
+        offset, content_len, _, _ = self._card(level, subject, i)
+        return self._mm[offset:offset + content_len].decode("utf-8")
+
+    def close(self):
+        self._mm.close()
+
+
+def build(json_path: str = JSON_PATH, out_path: str = BIN_PATH) -> dict:
+    """Compile the JSON knowledge base into the compact format. Returns card counts per group."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    groups = [
+        (f"{level}/{subject}".encode("utf-8"), cards)
+        for level, subjects in data.items()
+        for subject, cards in subjects.items()
+    ]
+    directory_size = HEADER.size + sum(2 + len(name) + GROUP.size for name, _ in groups)
+    tables_size = sum(len(cards) * CARD.size for _, cards in groups)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(groups)))
+        table = directory_size
+        for name, cards in groups:
+            f.write(struct.pack("<H", len(name)) + name + GROUP.pack(len(cards), table))
+            table += len(cards) * CARD.size
+
+        record = directory_size + tables_size
+        for _, cards in groups:
+            for card in cards:
+                topic = extract_topic(card)
+                topic_start = len(card[:card.find(topic)].encode("utf-8"))
+                content_len = len(card.encode("utf-8"))
+                f.write(CARD.pack(record, content_len, topic_start, len(topic.encode("utf-8"))))
+                record += content_len
+        for _, cards in groups:
+            for card in cards:
+                f.write(card.encode("utf-8"))
+    os.replace(tmp_path, out_path)
+    return {name.decode("utf-8"): len(cards) for name, cards in groups}
+
+
+def open_store(json_path: str = JSON_PATH, bin_path: str = BIN_PATH) -> KnowledgeStore:
+    """Prefer the compiled file when it is at least as new as the JSON source."""
+    try:
+        if os.path.exists(bin_path) and (
+            not os.path.exists(json_path) or os.path.getmtime(bin_path) >= os.path.getmtime(json_path)
+        ):
+            return CompactKnowledgeStore(bin_path)
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Compact knowledge base unusable, loading JSON: {e}")
+    try:
+        return JsonKnowledgeStore.load(json_path)
+    except Exception:
+        return JsonKnowledgeStore({"primary": {}, "advanced": {}})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="knowledge_store.py", description="Compile the fallback knowledge base")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--json", default=JSON_PATH)
+    parser.add_argument("--out", default=BIN_PATH)
+    args = parser.parse_args()
+
+    counts = build(args.json, args.out)
+    print(f"✅ {sum(counts.values())} cards in {len(counts)} groups -> {args.out} ({os.path.getsize(args.out)} bytes)")
@@ -1,20 +1,23 @@
 
 import os
 import random
-import json
-import re
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from functools import cached_property, lru_cache
 from typing import List, Optional
 from datetime import datetime, timedelta
-from fastapi import FastAPI, UploadFile, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, UploadFile, HTTPException, Depends, Header, Request, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, field_validator
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Boolean
-from sqlalchemy.orm import sessionmaker, Session, declarative_base
-from openai import OpenAI
+from sqlalchemy.orm import Session
 from dotenv import load_dotenv
-from passlib.context import CryptContext
-from jose import jwt, JWTError
+
+# openai, passlib and jose are imported on first use (see get_pwd_context,
+# create_access_token and KnowledgeService.client) to keep worker cold start fast.
 
 load_dotenv()
 
@@ -22,75 +25,51 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "eduflow-secret-key-2025")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") # Enables /api/admin/* when set
+
+# Cache / rate limit Config (backend chosen by EDUFLOW_CACHE, see cache.py)
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))
+CARD_CACHE_TTL = int(os.getenv("CARD_CACHE_TTL", "600"))
+EXPLAIN_CACHE_TTL = int(os.getenv("EXPLAIN_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_RATE_LIMIT = int(os.getenv("LLM_RATE_LIMIT", "0")) # LLM calls per minute across all workers, 0 = unlimited
 
-# Database Setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./eduflow.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Models
-class Account(Base):
-    __tablename__ = "accounts"
-    id = Column(Integer, primary_key=True, index=True)
-    username = Column(String, unique=True, index=True)
-    hashed_password = Column(String)
-
-class User(Base):
-    __tablename__ = "users"
-    id = Column(Integer, primary_key=True, index=True)
-    account_id = Column(Integer, ForeignKey("accounts.id"))
-    name = Column(String, index=True)
-    phase = Column(String)
-    grade = Column(String)
-    subjects = Column(String) # Stored as comma-separated string
-
-class Goal(Base):
-    __tablename__ = "goals"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    description = Column(String)
-    target_date = Column(String)
-    is_active = Column(Boolean, default=True)
-
-class CalendarEntry(Base):
-    __tablename__ = "calendar_entries"
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    date = Column(String) # YYYY-MM-DD
-    content = Column(Text)
-    subject = Column(String)
-
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+from database import engine, Base, SessionLocal, get_db, DEFAULT_BATCH_SIZE
+from models import Account, User, Goal, CalendarEntry, ensure_indexes
+import stats
+import history
+from cache import get_cache, rate_limited, remember_auth, remember_cards
+from knowledge_store import extract_topic, is_duplicate, open_store
+import profiling
+
+router = APIRouter(route_class=profiling.ProfiledRoute)
 
 # Auth Security
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 # Auth Helpers
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    with profiling.phase("auth"):
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    with profiling.phase("auth"):
+        return get_pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with profiling.phase("auth"):
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 async def get_current_account(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -99,8 +78,20 @@ async def get_current_account(token: str = Depends(oauth2_scheme), db: Session =
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Tokens that were already verified skip the JWT decode and username lookup
+    cache_key = "auth:" + hashlib.sha256(token.encode()).hexdigest()
+    cached = get_cache().get(cache_key)
+    if cached is not None:
+        account_id, username = cached
+        account = db.get(Account, account_id)
+        # Ids are reused after a delete, so the row must still be the same account
+        if account is not None and account.username == username:
+            return account
+
+    from jose import jwt, JWTError
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with profiling.phase("auth"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -110,8 +101,21 @@ async def get_current_account(token: str = Depends(oauth2_scheme), db: Session =
     account = db.query(Account).filter(Account.username == username).first()
     if account is None:
         raise credentials_exception
+    ttl = min(AUTH_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        remember_auth(cache_key, account.id, account.username, ttl)
     return account
 
+def get_owned_user(db: Session, user_id: int, account: Account) -> User:
+    user = db.query(User).filter(User.id == user_id, User.account_id == account.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin token required")
+
 # Pydantic Models
 class AccountCreate(BaseModel):
     username: str
@@ -175,26 +179,9 @@ class ForgotPasswordRequest(BaseModel):
     email: str
 
 # Knowledge Service Helpers
-def extract_topic(content: str) -> str:
-    # Handle prefixes like "知识点：", "Topic:", etc.
-    # First, try to remove these patterns from the start
-    clean_content = re.sub(r'^(Topic|Concept|主题|概念|知识点|Title|标题)[:：\-\s]+', '', content, flags=re.I)
-    
-    # Then split by either Chinese '：' or standard ':' to get the header
-    parts = re.split(r'[:：]', clean_content, maxsplit=1)
-    topic = parts[0].strip() if parts else clean_content.strip()
-    return topic
-
-def is_duplicate(new_topic: str, excluded_topics: List[str]) -> bool:
-    if not excluded_topics:
-        return False
-    new_t = new_topic.lower()
-    for ex in excluded_topics:
-        ex_t = ex.lower()
-        # Exact match or substring match (e.g. "勾股定理" matches "勾股定理的应用")
-        if ex_t in new_t or new_t in ex_t:
-            return True
-    return False
+def usage_tokens(response) -> int:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
 
 def log_debug_generation(msg: str):
     try:
@@ -211,25 +198,35 @@ class KnowledgeService:
     def __init__(self):
         self.api_key = os.getenv("LLM_API_KEY") 
         self.base_url = os.getenv("LLM_BASE_URL", "https://api.siliconflow.cn/v1")
-        self.client = None
-        if self.api_key:
-            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
-        
-        self.knowledge_db = {}
-        try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            json_path = os.path.join(current_dir, "data", "knowledge_base.json")
-            with open(json_path, "r", encoding="utf-8") as f:
-                self.knowledge_db = json.load(f)
-        except Exception:
-            self.knowledge_db = {"primary": {}, "advanced": {}}
+
+    # The OpenAI client and the knowledge base are built on first use
+    @cached_property
+    def client(self):
+        if not self.api_key:
+            return None
+        from openai import OpenAI
+        return OpenAI(api_key=self.api_key, base_url=self.base_url)
+
+    @cached_property
+    def knowledge_store(self):
+        # Memory-mapped data/knowledge_base.bin when built, else the JSON file
+        return open_store()
+
+    def warmup(self):
+        self.client
+        self.knowledge_store
 
     def generate(self, subject: str, grade: str, phase: str, current_date: str = None, exclude_topics: List[str] = None):
+        """Returns (content, source, tokens) where source is "llm" or "fallback"."""
+        tokens = 0
         if self.client:
             date_context = f" Assume today's date for a Chinese Mainland student is {current_date or datetime.now().strftime('%Y-%m-%d')}."
             
             # Implementation of Re-try Loop (up to 3 times)
             for attempt in range(4):
+                if rate_limited("llm", LLM_RATE_LIMIT):
+                    log_debug_generation(f"RATE_LIMITED: Falling back to knowledge base for subject '{subject}'.")
+                    break
                 exclude_text = ""
                 if exclude_topics:
                     # Randomize the exclusion list a bit if it's too long, but keep most recent
@@ -237,70 +234,81 @@ class KnowledgeService:
                     exclude_text = f" CRITICAL: You MUST NOT generate these topics (or sub-topics of them): {', '.join(display_exclude)}. If you already mentioned these, choose a COMPLETELY DIFFERENT chapter (e.g., if Geometry is full, move to Algebra or Probability)."
                 
                 try:
-                    response = self.client.chat.completions.create(
-                        model="Qwen/Qwen2.5-72B-Instruct", 
-                        messages=[
-                            {"role": "system", "content": f"You are an expert tutor for {phase} {grade} students in Mainland China. Accuracy and VARIETY are your top priorities. Never repeat topics from the provided negative list."},
-                            {"role": "user", "content": f"Generate a UNIQUE, insightful educational card for a {phase} {grade} student studying {subject}.{date_context} {exclude_text} Language: Chinese. Max 60 words. \n\nGoal: Align with the typical Chinese academic calendar. Format: 'Concept Name：Content'. (Sub-topic Randomizer: {random.random()})"}
-                        ],
-                        timeout=30,
-                        temperature=0.95
-                    )
+                    with profiling.phase("llm"):
+                        response = self.client.chat.completions.create(
+                            model="Qwen/Qwen2.5-72B-Instruct", 
+                            messages=[
+                                {"role": "system", "content": f"You are an expert tutor for {phase} {grade} students in Mainland China. Accuracy and VARIETY are your top priorities. Never repeat topics from the provided negative list."},
+                                {"role": "user", "content": f"Generate a UNIQUE, insightful educational card for a {phase} {grade} student studying {subject}.{date_context} {exclude_text} Language: Chinese. Max 60 words. \n\nGoal: Align with the typical Chinese academic calendar. Format: 'Concept Name：Content'. (Sub-topic Randomizer: {random.random()})"}
+                            ],
+                            timeout=30,
+                            temperature=0.95
+                        )
+                    tokens += usage_tokens(response)
                     content = response.choices[0].message.content
-                    new_topic = extract_topic(content)
+                    with profiling.phase("topics"):
+                        new_topic = extract_topic(content)
+                        duplicate = is_duplicate(new_topic, exclude_topics)
                     
                     # Audit the response
-                    if is_duplicate(new_topic, exclude_topics) and attempt < 3:
+                    if duplicate and attempt < 3:
                         log_debug_generation(f"RETRY_ATTEMPT {attempt+1}: AI generated duplicate topic '{new_topic}' for subject '{subject}'. Re-trying...")
                         continue # Re-try
                     
                     log_debug_generation(f"SUCCESS: Generated '{new_topic}' for User Session. Attempt: {attempt+1}")
-                    return content
+                    return content, "llm", tokens
                 except Exception as e:
                     print(f"LLM Failed: {e}")
                     break # Don't retry on network/api errors
         
         # Fallback
         is_primary = "小学" in str(phase)
-        target_db = self.knowledge_db.get("primary" if is_primary else "advanced", {})
-        candidates = target_db.get(subject)
-        if not candidates:
-            candidates = target_db.get("通用", [])
-        
-        if exclude_topics and candidates:
-            filtered = [c for c in candidates if not is_duplicate(extract_topic(c), exclude_topics)]
-            if filtered:
-                candidates = filtered
-
-        if not candidates:
-            candidates = [f"探索发现：{subject}充满了奥秘，保持好奇心！"]
+        level = "primary" if is_primary else "advanced"
+        store = self.knowledge_store
+        group = subject if store.count(level, subject) else "通用"
+        with profiling.phase("topics"):
+            content = store.sample(level, group, exclude_topics)
+
+        if not content:
+            content = f"探索发现：{subject}充满了奥秘，保持好奇心！"
             
-        return random.choice(candidates)
+        return content, "fallback", tokens
              
     def explain(self, content: str, subject: str, grade: str, phase: str):
+        """Returns (explanation, tokens)."""
         print(f"DEBUG_EXPLAIN: Subject={subject}")
         if not self.client:
-            return "智能助手暂不可用，请配置 API Key。"
+            return "智能助手暂不可用，请配置 API Key。", 0
+
+        cache_key = "explain:" + hashlib.sha256("\x1f".join([content, subject, grade, phase]).encode()).hexdigest()
+        cached = get_cache().get(cache_key)
+        if cached is not None:
+            return cached, 0
+        if rate_limited("llm", LLM_RATE_LIMIT):
+            return "智能助手正忙，请稍后再试。", 0
             
         try:
-            response = self.client.chat.completions.create(
-                model="Qwen/Qwen2.5-72B-Instruct", 
-                messages=[
-                    {"role": "system", "content": f"You are an expert {subject} tutor for {phase} {grade} students. Your goal is to explain {subject} concepts clearly and accurately."},
-                    {"role": "user", "content": f"Please explain the following {subject} concept in detail.\n\nConcept: '{content}'\n\nRequirements:\n1. Explain ONLY this concept.\n2. Use clear, encouraging language suitable for {grade}.\n3. Include examples/formulas if applicable.\n4. Output in Markdown. IMPORTANT: You MUST enclose ALL math formulas/symbols in $...$ (inline) or $$...$$ (block) for LaTeX rendering."}
-                ],
-                timeout=60,
-                temperature=0.7
-            )
-            return response.choices[0].message.content
+            with profiling.phase("llm"):
+                response = self.client.chat.completions.create(
+                    model="Qwen/Qwen2.5-72B-Instruct", 
+                    messages=[
+                        {"role": "system", "content": f"You are an expert {subject} tutor for {phase} {grade} students. Your goal is to explain {subject} concepts clearly and accurately."},
+                        {"role": "user", "content": f"Please explain the following {subject} concept in detail.\n\nConcept: '{content}'\n\nRequirements:\n1. Explain ONLY this concept.\n2. Use clear, encouraging language suitable for {grade}.\n3. Include examples/formulas if applicable.\n4. Output in Markdown. IMPORTANT: You MUST enclose ALL math formulas/symbols in $...$ (inline) or $$...$$ (block) for LaTeX rendering."}
+                    ],
+                    timeout=60,
+                    temperature=0.7
+                )
+            explanation = response.choices[0].message.content
+            get_cache().set(cache_key, explanation, ttl=EXPLAIN_CACHE_TTL)
+            return explanation, usage_tokens(response)
         except Exception as e:
             print(f"LLM Explain Failed: {str(e)}")
-            return "抱歉，生成详解时遇到问题，请稍后再试。"
+            return "抱歉，生成详解时遇到问题，请稍后再试。", 0
 
 knowledge_service = KnowledgeService()
 
 # Auth Endpoints
-@app.post("/api/register", response_model=Token)
+@router.post("/api/register", response_model=Token)
 def register(account_in: AccountCreate, db: Session = Depends(get_db)):
     account = db.query(Account).filter(Account.username == account_in.username).first()
     if account:
@@ -309,13 +317,14 @@ def register(account_in: AccountCreate, db: Session = Depends(get_db)):
     hashed_password = get_password_hash(account_in.password)
     new_account = Account(username=account_in.username, hashed_password=hashed_password)
     db.add(new_account)
+    stats.record_signup(db)
     db.commit()
     db.refresh(new_account)
     
     access_token = create_access_token(data={"sub": new_account.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.post("/api/token", response_model=Token)
+@router.post("/api/token", response_model=Token)
 def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     account = db.query(Account).filter(Account.username == form_data.username).first()
     if not account or not verify_password(form_data.password, account.hashed_password):
@@ -331,7 +340,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@app.post("/api/forgot-password")
+@router.post("/api/forgot-password")
 def forgot_password(req: ForgotPasswordRequest, db: Session = Depends(get_db)):
     # 1. Check if account exists
     account = db.query(Account).filter(Account.username == req.email).first()
@@ -344,7 +353,7 @@ def forgot_password(req: ForgotPasswordRequest, db: Session = Depends(get_db)):
     return {"message": "如果在我们的系统中找到改邮箱，重置链接已发送到您的邮箱。"}
 
 
-@app.post("/api/explain-card")
+@router.post("/api/explain-card")
 def explain_card(req: ExplainRequest, db: Session = Depends(get_db)):
     # Note: user_id is not passed in req for ExplainRequest currently
     # We should infer user info or expect it. 
@@ -352,13 +361,17 @@ def explain_card(req: ExplainRequest, db: Session = Depends(get_db)):
     # We might need to fetch user grade from db if not passed.
     # Or just use defaults.
     
-    return {"explanation": knowledge_service.explain(req.content, req.subject, req.grade, req.phase)}
+    explanation, tokens = knowledge_service.explain(req.content, req.subject, req.grade, req.phase)
+    if tokens:
+        stats.record_tokens(db, "explain", tokens)
+        db.commit()
+    return {"explanation": explanation}
 
-@app.get("/api/users", response_model=List[UserResponse])
+@router.get("/api/users", response_model=List[UserResponse])
 def get_users(current_account: Account = Depends(get_current_account), db: Session = Depends(get_db)):
     return db.query(User).filter(User.account_id == current_account.id).all()
 
-@app.post("/api/users", response_model=UserResponse)
+@router.post("/api/users", response_model=UserResponse)
 def create_user(user_in: UserCreate, current_account: Account = Depends(get_current_account), db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.name == user_in.name, User.account_id == current_account.id).first()
     if existing:
@@ -372,11 +385,12 @@ def create_user(user_in: UserCreate, current_account: Account = Depends(get_curr
         account_id=current_account.id
     )
     db.add(new_user)
+    stats.record_student(db)
     db.commit()
     db.refresh(new_user)
     return new_user
 
-@app.post("/api/generate-cards", response_model=List[CardResponse])
+@router.post("/api/generate-cards", response_model=List[CardResponse])
 def generate_cards(user_id: int, current_date: str, ignore_cache: bool = False, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -384,12 +398,24 @@ def generate_cards(user_id: int, current_date: str, ignore_cache: bool = False,
     
     date_obj = datetime.strptime(current_date, "%Y-%m-%d").date()
     cards_response = []
+    if stats.record_active(db, user.id):
+        db.commit()
+
+    # Whole-day card list, shared by all workers; regenerating invalidates it
+    cache_key = f"cards:{user.id}:{date_obj.isoformat()}"
+    owner = [user.account_id, user.name]
+    if not ignore_cache:
+        cached = get_cache().get(cache_key)
+        # Ids are reused after a delete, so the entry must still belong to the same student
+        if isinstance(cached, dict) and cached.get("owner") == owner:
+            return cached["cards"]
     
     # Get recent history to avoid repetition (expanded to last 30 entries)
     recent_entries = db.query(CalendarEntry).filter(
         CalendarEntry.user_id == user_id
     ).order_by(CalendarEntry.id.desc()).limit(30).all()
-    exclude_topics = [extract_topic(e.content) for e in recent_entries]
+    with profiling.phase("topics"):
+        exclude_topics = [extract_topic(e.content) for e in recent_entries]
     
     # Log excluded topics for debugging
     print(f"DEBUG_GENERATE: User={user_id}, Date={current_date}, Excluding={exclude_topics}")
@@ -427,7 +453,7 @@ def generate_cards(user_id: int, current_date: str, ignore_cache: bool = False,
             db.commit() 
         
         # Generate new with history exclusion and date context
-        content = knowledge_service.generate(subject, user.grade, user.phase, current_date=current_date, exclude_topics=exclude_topics)
+        content, source, tokens = knowledge_service.generate(subject, user.grade, user.phase, current_date=current_date, exclude_topics=exclude_topics)
         
         new_entry = CalendarEntry(
             date=date_obj,
@@ -436,6 +462,7 @@ def generate_cards(user_id: int, current_date: str, ignore_cache: bool = False,
             user_id=user.id
         )
         db.add(new_entry)
+        stats.record_card(db, subject, source, tokens)
         db.commit()
         db.refresh(new_entry)
         
@@ -452,9 +479,10 @@ def generate_cards(user_id: int, current_date: str, ignore_cache: bool = False,
             "date": current_date
         })
 
+    remember_cards(cache_key, user.id, {"owner": owner, "cards": cards_response}, CARD_CACHE_TTL)
     return cards_response
 
-@app.post("/api/regenerate-card", response_model=CardResponse)
+@router.post("/api/regenerate-card", response_model=CardResponse)
 def regenerate_single_card(user_id: int, subject: str, current_date: str, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -466,7 +494,8 @@ def regenerate_single_card(user_id: int, subject: str, current_date: str, db: Se
     recent_entries = db.query(CalendarEntry).filter(
         CalendarEntry.user_id == user_id
     ).order_by(CalendarEntry.id.desc()).limit(30).all()
-    exclude_topics = [extract_topic(e.content) for e in recent_entries]
+    with profiling.phase("topics"):
+        exclude_topics = [extract_topic(e.content) for e in recent_entries]
     
     print(f"DEBUG_REGENERATE: User={user_id}, Subject={subject}, Excluding={exclude_topics}")
 
@@ -482,7 +511,7 @@ def regenerate_single_card(user_id: int, subject: str, current_date: str, db: Se
         db.commit()
     
     # 2. Generate New with date context
-    content = knowledge_service.generate(subject, user.grade, user.phase, current_date=current_date, exclude_topics=exclude_topics)
+    content, source, tokens = knowledge_service.generate(subject, user.grade, user.phase, current_date=current_date, exclude_topics=exclude_topics)
     
     new_entry = CalendarEntry(
         date=date_obj,
@@ -491,8 +520,10 @@ def regenerate_single_card(user_id: int, subject: str, current_date: str, db: Se
         user_id=user.id
     )
     db.add(new_entry)
+    stats.record_card(db, subject, source, tokens)
     db.commit()
     db.refresh(new_entry)
+    get_cache().delete(f"cards:{user.id}:{date_obj.isoformat()}")
     
     return {
         "id": new_entry.id,
@@ -502,7 +533,7 @@ def regenerate_single_card(user_id: int, subject: str, current_date: str, db: Se
         "date": current_date
     }
 
-@app.get("/api/users/{user_id}/goal", response_model=Optional[GoalResponse])
+@router.get("/api/users/{user_id}/goal", response_model=Optional[GoalResponse])
 def get_user_goal(user_id: int, db: Session = Depends(get_db)):
     # Get the latest active goal
     goal = db.query(Goal).filter(
@@ -518,7 +549,7 @@ def get_user_goal(user_id: int, db: Session = Depends(get_db)):
         target_date=goal.target_date
     )
 
-@app.post("/api/users/{user_id}/goal", response_model=GoalResponse)
+@router.post("/api/users/{user_id}/goal", response_model=GoalResponse)
 def set_user_goal(user_id: int, goal_in: GoalCreate, db: Session = Depends(get_db)):
     # Deactivate old goals
     old_goals = db.query(Goal).filter(
@@ -544,5 +575,83 @@ def set_user_goal(user_id: int, goal_in: GoalCreate, db: Session = Depends(get_d
         target_date=new_goal.target_date
     )
 
+@router.get("/api/users/{user_id}/export")
+def export_user_history(user_id: int, current_account: Account = Depends(get_current_account), db: Session = Depends(get_db)):
+    user = get_owned_user(db, user_id, current_account)
+
+    # The stream outlives the request-scoped session, so it opens its own
+    def stream():
+        export_db = SessionLocal()
+        try:
+            yield from history.export_history(export_db, user)
+        finally:
+            export_db.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="eduflow-user-{user_id}.ndjson"'},
+    )
+
+def apply_history_batch(user_id: int, records: list) -> dict:
+    import_db = SessionLocal()
+    try:
+        return history.apply_batch(import_db, user_id, records)
+    finally:
+        import_db.close()
+
+@router.post("/api/users/{user_id}/import")
+async def import_user_history(request: Request, user_id: int, current_account: Account = Depends(get_current_account), db: Session = Depends(get_db)):
+    user = get_owned_user(db, user_id, current_account)
+    totals = {"inserted": 0, "updated": 0, "archived": 0}
+    batch = []
+    line_no = 0
+
+    async def flush():
+        counts = await run_in_threadpool(apply_history_batch, user.id, list(batch))
+        for key, value in counts.items():
+            totals[key] += value
+        batch.clear()
+
+    # Body is consumed as it arrives; each batch is its own transaction
+    try:
+        async for line in history.iter_ndjson_lines(request.stream()):
+            line_no += 1
+            record = history.parse_line(line, line_no)
+            if record is not None:
+                batch.append(record)
+            if len(batch) >= DEFAULT_BATCH_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    except (history.HistoryImportError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"{e} (already imported: {totals})")
+    return totals
+
+@router.get("/api/admin/stats", dependencies=[Depends(require_admin)])
+def get_stats(days: int = 7, db: Session = Depends(get_db)):
+    # Reads only the daily_stats aggregates, never the live tables
+    return stats.summary(db, max(1, min(days, 366)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    if os.getenv("EDUFLOW_WARMUP"):
+        knowledge_service.warmup()
+    yield
+
+def create_app() -> FastAPI:
+    """App factory: `uvicorn main:create_app --factory`."""
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(router)
+    # Opt-in per-request timings, see profiling.py
+    profiling.instrument_engine(engine)
+    app.add_middleware(profiling.ProfilingMiddleware, admin_token=ADMIN_TOKEN)
+    return app
+
+app = create_app()
+
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,45 +1,53 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, JSON
-from sqlalchemy.orm import relationship, declarative_base
-
-Base = declarative_base()
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, Index, text
+from database import Base
 
+# Models (the schema actually stored in eduflow.db)
 class Account(Base):
-    __tablename__ = 'accounts'
+    __tablename__ = "accounts"
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True)
     hashed_password = Column(String)
-    
-    users = relationship("User", back_populates="account")
 
 class User(Base):
-    __tablename__ = 'users'
+    __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True) # Removed unique=True to allow same names in different accounts
-    phase = Column(String) 
-    grade = Column(String) 
-    subjects = Column(JSON) 
-    account_id = Column(Integer, ForeignKey('accounts.id'))
-    
-    account = relationship("Account", back_populates="users")
-    goals = relationship("Goal", back_populates="user")
-    calendar_entries = relationship("CalendarEntry", back_populates="user")
+    account_id = Column(Integer, ForeignKey("accounts.id"))
+    name = Column(String, index=True)
+    phase = Column(String)
+    grade = Column(String)
+    subjects = Column(String) # Stored as comma-separated string
 
 class Goal(Base):
-    __tablename__ = 'goals'
+    __tablename__ = "goals"
     id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
     description = Column(String)
-    target_date = Column(Date)
+    target_date = Column(String)
     is_active = Column(Boolean, default=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
-
-    user = relationship("User", back_populates="goals")
 
 class CalendarEntry(Base):
-    __tablename__ = 'calendar_entries'
+    __tablename__ = "calendar_entries"
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, index=True)
-    content = Column(String) 
-    subject = Column(String) 
-    user_id = Column(Integer, ForeignKey('users.id'))
-    
-    user = relationship("User", back_populates="calendar_entries")
+    user_id = Column(Integer, ForeignKey("users.id"))
+    date = Column(String) # YYYY-MM-DD
+    content = Column(Text)
+    subject = Column(String)
+
+    __table_args__ = (Index("ix_calendar_entries_user_date", "user_id", "date"),)
+
+class DailyStat(Base):
+    __tablename__ = "daily_stats"
+    day = Column(String, primary_key=True) # YYYY-MM-DD, or "all" for running totals
+    metric = Column(String, primary_key=True)
+    dim = Column(String, primary_key=True, default="") # e.g. subject for card metrics
+    value = Column(Integer, default=0)
+
+class DailyActiveUser(Base):
+    __tablename__ = "daily_active_users"
+    day = Column(String, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+def ensure_indexes(bind):
+    # create_all() skips indexes on tables that already exist
+    with bind.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_calendar_entries_user_date ON calendar_entries (user_id, date)"))
@@ -0,0 +1,264 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when either
+    - it sends `X-Profile: 1` (or `cprofile` / `stacks`) together with a
+      valid `X-Admin-Token`, or
+    - it is picked by PROFILE_SAMPLE_RATE (0..1, default 0); PROFILE_DUMP
+      (`cprofile` or `stacks`) then selects a dump for sampled requests.
+
+Profiled requests get a `PROFILE:` log line with per-phase times in ms;
+requests that sent a valid admin token also get them in a `Server-Timing`
+response header (sampled requests from other clients are only logged):
+    db             time inside SQL statements (SQLAlchemy cursor events)
+    llm            time waiting on the LLM API
+    auth           token verification / password hashing
+    topics         topic extraction for duplicate filtering
+    framework      FastAPI's work around the endpoint: request parsing, dependency
+                   resolution, the threadpool hop for sync endpoints and
+                   response validation/serialization (dependency auth and db
+                   time excluded)
+    total          whole request
+
+`cprofile` also writes a .pstats file and `stacks` a collapsed-stack file
+(flamegraph.pl / speedscope input) to PROFILE_DIR (default ./profiles).
+Both cover the endpoint body in the thread that runs it.
+
+When a request is not profiled, every hook is a single ContextVar lookup.
+"""
+import cProfile
+import contextvars
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DUMP = os.getenv("PROFILE_DUMP", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+STACK_SAMPLE_INTERVAL = 0.001
+
+_current = contextvars.ContextVar("eduflow_profile", default=None)
+_NULL = nullcontext()
+
+
+class RequestProfile:
+    def __init__(self, path: str, dump: str = "", expose: bool = False):
+        self.path = path
+        self.dump = dump
+        self.expose = expose
+        self.phases = Counter()
+        self.start = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] += seconds
+
+
+@contextmanager
+def _timed(profile: RequestProfile, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+
+@contextmanager
+def _endpoint(profile: RequestProfile):
+    # Auth and db spent inside the endpoint are not dependency time
+    auth_before, db_before = profile.phases["auth"], profile.phases["db"]
+    try:
+        with _timed(profile, "endpoint"), _dumping(profile):
+            yield
+    finally:
+        profile.add("endpoint_auth", profile.phases["auth"] - auth_before)
+        profile.add("endpoint_db", profile.phases["db"] - db_before)
+
+
+def phase(name: str):
+    """`with phase("llm"): ...` adds the block's wall time to the current request's profile."""
+    profile = _current.get()
+    return _timed(profile, name) if profile is not None else _NULL
+
+
+# DB timing via SQLAlchemy cursor events
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    starts = conn.info.get("profile_start")
+    if profile is not None and starts:
+        profile.add("db", time.perf_counter() - starts.pop())
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Dumps
+class StackSampler(threading.Thread):
+    """Samples one thread's stack every STACK_SAMPLE_INTERVAL into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(STACK_SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _dump_path(profile: RequestProfile, suffix: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    slug = profile.path.strip("/").replace("/", "_") or "root"
+    return os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{os.getpid()}{suffix}")
+
+
+@contextmanager
+def _dumping(profile: RequestProfile):
+    if profile.dump == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            path = _dump_path(profile, ".pstats")
+            prof.dump_stats(path)
+            print(f"PROFILE_DUMP: {path}")
+    elif profile.dump == "stacks":
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = _dump_path(profile, ".collapsed")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in sampler.stacks.items():
+                    f.write(f"{stack} {count}\n")
+            print(f"PROFILE_DUMP: {path}")
+    else:
+        yield
+
+
+class ProfiledRoute(APIRoute):
+    """Times the endpoint body separately from the work FastAPI does around it."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, self._wrap_endpoint(endpoint), **kwargs)
+
+    @staticmethod
+    def _wrap_endpoint(endpoint):
+        if inspect.iscoroutinefunction(endpoint):
+            @wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                profile = _current.get()
+                if profile is None:
+                    return await endpoint(*args, **kwargs)
+                with _endpoint(profile):
+                    return await endpoint(*args, **kwargs)
+        else:
+            @wraps(endpoint)
+            def wrapper(*args, **kwargs):
+                profile = _current.get()
+                if profile is None:
+                    return endpoint(*args, **kwargs)
+                with _endpoint(profile):
+                    return endpoint(*args, **kwargs)
+        return wrapper
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request):
+            profile = _current.get()
+            if profile is None:
+                return await handler(request)
+            with _timed(profile, "route"):
+                return await handler(request)
+        return profiled_handler
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware: decides whether to profile and reports the result."""
+
+    def __init__(self, app, admin_token: str = None):
+        self.app = app
+        self.admin_token = admin_token
+
+    def _requested_mode(self, scope):
+        """(mode, expose): expose only when the caller proved it is an admin."""
+        if not self.admin_token and PROFILE_SAMPLE_RATE <= 0:
+            return "", False
+        headers = dict(scope.get("headers") or [])
+        is_admin = bool(self.admin_token) and headers.get(b"x-admin-token", b"").decode() == self.admin_token
+        mode = headers.get(b"x-profile")
+        if mode and is_admin:
+            mode = mode.decode().strip().lower()
+            return (mode if mode in ("cprofile", "stacks") else "timings"), True
+        if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            return (PROFILE_DUMP if PROFILE_DUMP in ("cprofile", "stacks") else "timings"), is_admin
+        return "", False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        mode, expose = self._requested_mode(scope)
+        if not mode:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(scope.get("path", ""), dump="" if mode == "timings" else mode, expose=expose)
+        token = _current.set(profile)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and profile.expose:
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", server_timing(profile).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            print(f"PROFILE: {scope.get('method')} {profile.path} {server_timing(profile)}")
+
+
+def summarize(profile: RequestProfile) -> dict:
+    phases = dict(profile.phases)
+    route = phases.pop("route", 0.0)
+    endpoint = phases.pop("endpoint", 0.0)
+    dependency_auth = phases.get("auth", 0.0) - phases.pop("endpoint_auth", 0.0)
+    dependency_db = phases.get("db", 0.0) - phases.pop("endpoint_db", 0.0)
+    if route:
+        # Everything the route did outside the endpoint body, minus dependency auth and db
+        phases["framework"] = max(route - endpoint - dependency_auth - dependency_db, 0.0)
+    phases["total"] = time.perf_counter() - profile.start
+    return phases
+
+
+def server_timing(profile: RequestProfile) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in summarize(profile).items())
@@ -0,0 +1,266 @@
+"""Retention for calendar_entries.
+
+Entries older than the horizon (RETENTION_DAYS, default 180) are moved out
+of eduflow.db into monthly archive partitions under ARCHIVE_DIR (default
+./archive):
+
+    calendar-YYYY-MM[.N].ndjson.gz  gzip NDJSON, one gzip member per student
+    calendar-YYYY-MM.idx.json       data file name and
+                                    {user_id: [[offset, length], ...]}
+
+Concatenated gzip members are still a valid .gz file, and the index lets a
+single student's rows be read by seeking to their members without
+decompressing the rest of the month. Rows keep their original id, so a
+run interrupted between writing the archive and deleting the live rows
+is harmless: readers drop repeated ids.
+
+Run from admin.py (`python admin.py archive --days 180 [--vacuum]`).
+"""
+import fcntl
+import gzip
+import json
+import os
+import re
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.orm import Session
+
+from database import DEFAULT_BATCH_SIZE, MAX_IN_PARAMS
+from models import CalendarEntry, ensure_indexes
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "180"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+
+
+def cutoff_date(days: int = RETENTION_DAYS, today: Optional[date] = None) -> str:
+    return ((today or date.today()) - timedelta(days=days)).isoformat()
+
+
+def next_month(month: str) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+class Partition:
+    """One month of archived entries.
+
+    The index names the data file it describes, so a rewrite goes to a new
+    data file and is published by atomically replacing the index: readers
+    always see a matching pair without locking. Writers (append, drop_users)
+    serialize on a per-partition lock file.
+    """
+
+    def __init__(self, month: str, archive_dir: str = ARCHIVE_DIR):
+        self.month = month
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, f"calendar-{month}.idx.json")
+        self.lock_path = os.path.join(archive_dir, f"calendar-{month}.lock")
+
+    def _data_name(self, generation: int) -> str:
+        suffix = f".{generation}" if generation else ""
+        return f"calendar-{self.month}{suffix}.ndjson.gz"
+
+    @contextmanager
+    def lock(self):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load_index(self) -> dict:
+        """{"generation": n, "data": file name, "users": {user_id: [[offset, length], ...]}}"""
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            index = {}
+        if "users" not in index:
+            # Also reads indexes written before the data file was named in them
+            index = {"generation": 0, "data": self._data_name(0), "users": index}
+        return index
+
+    def save_index(self, index: dict):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.index_path)
+
+    def append(self, rows_by_user: Dict[int, List[dict]]):
+        """Append one gzip member per student, then publish them in the index."""
+        with self.lock():
+            index = self.load_index()
+            # Readers holding the previous index never look past its offsets
+            with open(os.path.join(self.archive_dir, index["data"]), "ab") as f:
+                for user_id, rows in rows_by_user.items():
+                    payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+                    member = gzip.compress(payload.encode("utf-8"))
+                    offset = f.tell()
+                    f.write(member)
+                    index["users"].setdefault(str(user_id), []).append([offset, len(member)])
+                f.flush()
+                os.fsync(f.fileno())
+            self.save_index(index)
+
+    def read_user(self, user_id: int) -> Iterator[dict]:
+        missing = None
+        while True:
+            index = self.load_index()
+            if str(user_id) not in index["users"]:
+                return
+            if index["data"] == missing:
+                raise FileNotFoundError(f"{self.index_path} refers to missing {index['data']}")
+            try:
+                f = open(os.path.join(self.archive_dir, index["data"]), "rb")
+                break
+            except FileNotFoundError:
+                # Retried only if a rewrite replaced the file between reading the index and opening it
+                missing = index["data"]
+        with f:
+            for offset, length in index["users"][str(user_id)]:
+                f.seek(offset)
+                for line in gzip.decompress(f.read(length)).decode("utf-8").splitlines():
+                    if line:
+                        yield json.loads(line)
+
+    def drop_users(self, user_ids) -> int:
+        """Rewrite the partition without the given students. Returns members removed."""
+        with self.lock():
+            index = self.load_index()
+            users = index["users"]
+            drop = {str(u) for u in user_ids} & users.keys()
+            if not drop:
+                return 0
+            removed = sum(len(users.pop(u)) for u in drop)
+            old_data = os.path.join(self.archive_dir, index["data"])
+            if not users:
+                os.remove(self.index_path)
+                os.remove(old_data)
+                return removed
+
+            generation = index["generation"] + 1
+            new_name = self._data_name(generation)
+            new_users = {}
+            with open(old_data, "rb") as src, open(os.path.join(self.archive_dir, new_name), "wb") as dst:
+                for user_id, spans in users.items():
+                    for offset, length in spans:
+                        src.seek(offset)
+                        new_users.setdefault(user_id, []).append([dst.tell(), length])
+                        dst.write(src.read(length))
+                dst.flush()
+                os.fsync(dst.fileno())
+            self.save_index({"generation": generation, "data": new_name, "users": new_users})
+            os.remove(old_data)
+            return removed
+
+
+def list_months(archive_dir: str = ARCHIVE_DIR) -> List[str]:
+    try:
+        names = os.listdir(archive_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(n[len("calendar-"):-len(".idx.json")] for n in names if n.startswith("calendar-") and n.endswith(".idx.json"))
+
+
+def read_archived(user_id: int, archive_dir: str = ARCHIVE_DIR) -> Iterator[dict]:
+    """All archived entries of a student, oldest month first."""
+    for month in list_months(archive_dir):
+        seen = set()
+        for row in Partition(month, archive_dir).read_user(user_id):
+            if row["id"] not in seen:
+                seen.add(row["id"])
+                yield row
+
+
+def archived_keys(user_id: int, months, archive_dir: str = ARCHIVE_DIR) -> set:
+    """(date, subject) of a student's archived entries in the given months."""
+    keys = set()
+    for month in set(months) & set(list_months(archive_dir)):
+        keys.update((row["date"], row["subject"]) for row in Partition(month, archive_dir).read_user(user_id))
+    return keys
+
+
+def forget_users(user_ids, archive_dir: str = ARCHIVE_DIR) -> int:
+    """Remove deleted students from every partition so their ids can't resurface."""
+    return sum(Partition(m, archive_dir).drop_users(user_ids) for m in list_months(archive_dir))
+
+
+def archive_entries(db: Session, days: int = RETENTION_DAYS, batch_size: int = DEFAULT_BATCH_SIZE,
+                    dry_run: bool = False, archive_dir: str = ARCHIVE_DIR, on_batch=None) -> dict:
+    """Move entries older than `days` into the archive, one month and one batch of students at a time."""
+    cutoff = cutoff_date(days)
+    batch_size = min(batch_size, MAX_IN_PARAMS)
+    ensure_indexes(db.get_bind())
+    totals = {"cutoff": cutoff, "entries": 0, "months": 0}
+    month_col = func.substr(CalendarEntry.date, 1, 7)
+    months = db.execute(
+        select(month_col).where(CalendarEntry.date < cutoff).group_by(month_col).order_by(month_col)
+    ).scalars().all()
+
+    for month in months:
+        if not month or not re.fullmatch(r"\d{4}-\d{2}", month):
+            continue # Malformed dates stay live
+        totals["months"] += 1
+        # Range predicate so the (user_id, date) index can be used
+        in_month = (
+            (CalendarEntry.date >= f"{month}-01")
+            & (CalendarEntry.date < f"{next_month(month)}-01")
+            & (CalendarEntry.date < cutoff)
+        )
+        if dry_run:
+            totals["entries"] += db.execute(select(func.count()).select_from(CalendarEntry).where(in_month)).scalar()
+            continue
+
+        partition = Partition(month, archive_dir)
+        last_user = -1
+        while True:
+            # Keyset over students so each batch is bounded
+            user_ids = db.execute(
+                select(CalendarEntry.user_id).where(in_month, CalendarEntry.user_id > last_user)
+                .group_by(CalendarEntry.user_id).order_by(CalendarEntry.user_id).limit(batch_size)
+            ).scalars().all()
+            if not user_ids:
+                break
+            last_user = user_ids[-1]
+
+            rows_by_user = {}
+            ids = []
+            for e in db.execute(
+                select(CalendarEntry.id, CalendarEntry.user_id, CalendarEntry.date, CalendarEntry.subject, CalendarEntry.content)
+                .where(in_month, CalendarEntry.user_id.in_(user_ids)).order_by(CalendarEntry.user_id, CalendarEntry.id)
+            ):
+                rows_by_user.setdefault(e.user_id, []).append(
+                    {"id": e.id, "date": str(e.date), "subject": e.subject, "content": e.content}
+                )
+                ids.append(e.id)
+
+            # Archive is durable before the live rows go away
+            partition.append(rows_by_user)
+            try:
+                for i in range(0, len(ids), MAX_IN_PARAMS):
+                    db.execute(delete(CalendarEntry).where(CalendarEntry.id.in_(ids[i:i + MAX_IN_PARAMS])))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            totals["entries"] += len(ids)
+            if on_batch:
+                on_batch(month, totals)
+    return totals
+
+
+def maintain(db: Session, vacuum: bool = False):
+    """Refresh planner statistics, and optionally reclaim the freed pages (VACUUM locks the database)."""
+    db.commit()
+    with db.get_bind().connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text("ANALYZE"))
+        if vacuum:
+            conn.execute(text("VACUUM"))
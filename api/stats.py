@@ -1,34 +1,180 @@
-from sqlalchemy import create_engine, func
-from sqlalchemy.orm import sessionmaker
-from models import Base, Account, User
+"""Incremental operational statistics.
 
-# Database Setup (Same as main.py)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./eduflow.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Counters live in the compact `daily_stats` table, one row per
+(day, metric, dim). Request handlers bump them inside their own
+transaction via `incr()` / `record_*()`, so the dashboard never has to
+scan `accounts`, `users` or `calendar_entries`: reading N days costs
+N * (metrics x subjects) rows regardless of how big those tables get.
 
-def print_stats():
+Metrics:
+    signups                  accounts registered
+    students                 student profiles created
+    active_students          distinct students who requested cards that day
+    cards_llm/<subject>      cards generated by the LLM
+    cards_fallback/<subject> cards served from the local knowledge base
+    llm_tokens/<kind>        tokens reported by the LLM API (generate / explain)
+
+Day "all" holds running totals for signups and students.
+
+Usage:
+    python stats.py                # last 7 days
+    python stats.py --days 30
+    python stats.py backfill       # seed running totals once from COUNT(*)
+    python stats.py rollup         # prune dedup rows for past days
+"""
+import argparse
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from models import Account, User, DailyStat, DailyActiveUser
+
+TOTAL_DAY = "all"
+DEFAULT_DAYS = 7
+
+
+def today() -> str:
+    return date.today().isoformat()
+
+
+# Write side (called from request handlers before their commit)
+def incr(db: Session, metric: str, amount: int = 1, dim: str = "", day: Optional[str] = None):
+    if not amount:
+        return
+    stmt = insert(DailyStat).values(day=day or today(), metric=metric, dim=dim, value=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStat.day, DailyStat.metric, DailyStat.dim],
+        set_={"value": DailyStat.value + stmt.excluded.value},
+    )
+    db.execute(stmt)
+
+
+def record_signup(db: Session):
+    incr(db, "signups")
+    incr(db, "signups", day=TOTAL_DAY)
+
+
+def record_student(db: Session):
+    incr(db, "students")
+    incr(db, "students", day=TOTAL_DAY)
+
+
+# Per-process memo so repeat visits on the same day skip the write entirely
+_active_seen = {"day": None, "ids": set()}
+
+def record_active(db: Session, user_id: int) -> bool:
+    """Count `user_id` as active today. Returns True if the session needs a commit."""
+    day = today()
+    if _active_seen["day"] != day:
+        _active_seen["day"], _active_seen["ids"] = day, set()
+    if user_id in _active_seen["ids"]:
+        return False
+    _active_seen["ids"].add(user_id)
+    stmt = insert(DailyActiveUser).values(day=day, user_id=user_id).on_conflict_do_nothing()
+    if db.execute(stmt).rowcount:
+        incr(db, "active_students", day=day)
+    return True
+
+
+def record_card(db: Session, subject: str, source: str, tokens: int = 0):
+    incr(db, f"cards_{source}", dim=subject)
+    incr(db, "llm_tokens", tokens, dim="generate")
+
+
+def record_tokens(db: Session, kind: str, tokens: int):
+    incr(db, "llm_tokens", tokens, dim=kind)
+
+
+# Read side
+def summary(db: Session, days: int = DEFAULT_DAYS) -> dict:
+    """Aggregate the last `days` days from daily_stats only."""
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    rows = db.execute(
+        select(DailyStat.day, DailyStat.metric, DailyStat.dim, DailyStat.value).where(
+            (DailyStat.day == TOTAL_DAY) | ((DailyStat.day >= since) & (DailyStat.day <= today()))
+        )
+    ).all()
+
+    totals = {"accounts": 0, "students": 0}
+    per_day = {}
+    for r in rows:
+        if r.day == TOTAL_DAY:
+            totals["accounts" if r.metric == "signups" else r.metric] = r.value
+            continue
+        d = per_day.setdefault(r.day, {
+            "signups": 0, "students": 0, "active_students": 0,
+            "cards_llm": 0, "cards_fallback": 0, "llm_tokens": 0, "cards_by_subject": {},
+        })
+        if r.metric in ("cards_llm", "cards_fallback"):
+            d[r.metric] += r.value
+            d["cards_by_subject"][r.dim] = d["cards_by_subject"].get(r.dim, 0) + r.value
+        elif r.metric in d:
+            d[r.metric] += r.value
+
+    for d in per_day.values():
+        cards = d["cards_llm"] + d["cards_fallback"]
+        d["fallback_ratio"] = round(d["cards_fallback"] / cards, 3) if cards else 0.0
+
+    return {"totals": totals, "days": dict(sorted(per_day.items(), reverse=True))}
+
+
+# Maintenance
+def backfill(db: Session):
+    """Seed the running totals from the live tables. Run once after upgrading."""
+    for metric, model in (("signups", Account), ("students", User)):
+        count = db.execute(select(func.count()).select_from(model)).scalar()
+        stmt = insert(DailyStat).values(day=TOTAL_DAY, metric=metric, dim="", value=count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyStat.day, DailyStat.metric, DailyStat.dim],
+            set_={"value": stmt.excluded.value},
+        )
+        db.execute(stmt)
+    db.commit()
+
+
+def rollup(db: Session) -> int:
+    """Drop per-student dedup rows for past days; their counts are already in daily_stats."""
+    removed = db.execute(delete(DailyActiveUser).where(DailyActiveUser.day < today())).rowcount
+    db.commit()
+    return removed
+
+
+def print_stats(db: Session, days: int = DEFAULT_DAYS):
+    data = summary(db, days)
+    print("\n" + "=" * 40)
+    print(f"📊 EduFlow 实时运营数据")
+    print("=" * 40)
+    print(f"🏠 注册家庭账号数:   {data['totals']['accounts']} 个")
+    print(f"👶 累计学生档案数:   {data['totals']['students']} 人")
+    print("=" * 40)
+    for day, d in data["days"].items():
+        print(f"📅 {day}  新注册 {d['signups']} | 新学生 {d['students']} | 活跃学生 {d['active_students']}")
+        print(f"   卡片 LLM {d['cards_llm']} / 本地 {d['cards_fallback']} (fallback {d['fallback_ratio']:.0%}) | tokens {d['llm_tokens']}")
+        if d["cards_by_subject"]:
+            print("   " + " ".join(f"{s}:{n}" for s, n in sorted(d["cards_by_subject"].items())))
+    print("=" * 40 + "\n")
+
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine, Base
+
+    parser = argparse.ArgumentParser(prog="stats.py", description="EduFlow 运营数据")
+    parser.add_argument("command", nargs="?", choices=["show", "backfill", "rollup"], default="show")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
     db = SessionLocal()
     try:
-        # Count Accounts (Families)
-        account_count = db.query(Account).count()
-        
-        # Count Users (Students)
-        user_count = db.query(User).count()
-        
-        # Count Accounts created in last 24h (Needs created_at, ignoring for now)
-        
-        print("\n" + "=" * 40)
-        print(f"📊 EduFlow 实时运营数据")
-        print("=" * 40)
-        print(f"🏠 注册家庭账号数:   {account_count} 个")
-        print(f"👶 累计学生档案数:   {user_count} 人")
-        print("=" * 40 + "\n")
-        
-    except Exception as e:
-        print(f"Error fetching stats: {e}")
+        if args.command == "backfill":
+            backfill(db)
+            print("✅ 已根据现有数据初始化累计总数。")
+        elif args.command == "rollup":
+            print(f"✅ 已清理 {rollup(db)} 条历史活跃记录。")
+        else:
+            print_stats(db, max(args.days, 1))
     finally:
         db.close()
-
-if __name__ == "__main__":
-    print_stats()